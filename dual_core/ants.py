@@ -1,347 +1,487 @@
-"""
-Module managing an ant colony in a labyrinth.
-"""
-import numpy as np
-import maze
-import pheromone
-import direction as d
-import pygame as pg
-import mpi4py as mpi
-from mpi4py import MPI
-
-UNLOADED, LOADED = False, True
-
-exploration_coefs = 0.
-
-
-class Colony:
-    """
-    Represent an ant colony. Ants are not individualized for performance reasons!
-
-    Inputs :
-        nb_ants  : Number of ants in the anthill
-        pos_init : Initial positions of ants (anthill position)
-        max_life : Maximum life that ants can reach
-    """
-    def __init__(self, nb_ants, pos_init, max_life):
-        # Each ant has is own unique random seed
-        self.seeds = np.arange(1, nb_ants+1, dtype=np.int64)
-        # State of each ant : loaded or unloaded
-        self.is_loaded = np.zeros(nb_ants, dtype=np.int8)
-        # Compute the maximal life amount for each ant :
-        #   Updating the random seed :
-        self.seeds[:] = np.mod(16807*self.seeds[:], 2147483647)
-        # Amount of life for each ant = 75% à 100% of maximal ants life
-        self.max_life = max_life * np.ones(nb_ants, dtype=np.int32)
-        self.max_life -= np.int32(max_life*(self.seeds/2147483647.))//4
-        # Ages of ants : zero at beginning
-        self.age = np.zeros(nb_ants, dtype=np.int64)
-        # History of the path taken by each ant. The position at the ant's age represents its current position.
-        self.historic_path = np.zeros((nb_ants, max_life+1, 2), dtype=np.int16)
-        self.historic_path[:, 0, 0] = pos_init[0]
-        self.historic_path[:, 0, 1] = pos_init[1]
-        # Direction in which the ant is currently facing (depends on the direction it came from).
-        self.directions = d.DIR_NONE*np.ones(nb_ants, dtype=np.int8)
-        self.sprites = []
-        if rank == 0 :
-            img = pg.image.load("ants.png").convert_alpha()
-            for i in range(0, 32, 8):
-                self.sprites.append(pg.Surface.subsurface(img, i, 0, 8, 8))
-
-    def return_to_nest(self, loaded_ants, pos_nest, food_counter):
-        """
-        Function that returns the ants carrying food to their nests.
-
-        Inputs :
-            loaded_ants: Indices of ants carrying food
-            pos_nest: Position of the nest where ants should go
-            food_counter: Current quantity of food in the nest
-
-        Returns the new quantity of food
-        """
-        self.age[loaded_ants] -= 1
-
-        in_nest_tmp = self.historic_path[loaded_ants, self.age[loaded_ants], :] == pos_nest
-        if in_nest_tmp.any():
-            in_nest_loc = np.nonzero(np.logical_and(in_nest_tmp[:, 0], in_nest_tmp[:, 1]))[0]
-            if in_nest_loc.shape[0] > 0:
-                in_nest = loaded_ants[in_nest_loc]
-                self.is_loaded[in_nest] = UNLOADED
-                self.age[in_nest] = 0
-                food_counter += in_nest_loc.shape[0]
-        return food_counter
-
-    def explore(self, unloaded_ants, the_maze, pos_food, pos_nest, pheromones):
-        """
-        Management of unloaded ants exploring the maze.
-
-        Inputs:
-            unloadedAnts: Indices of ants that are not loaded
-            maze        : The maze in which ants move
-            posFood     : Position of food in the maze
-            posNest     : Position of the ants' nest in the maze
-            pheromones  : The pheromone map (which also has ghost cells for
-                          easier edge management)
-
-        Outputs: None
-        """
-        # Update of the random seed (for manual pseudo-random) applied to all unloaded ants
-        self.seeds[unloaded_ants] = np.mod(16807*self.seeds[unloaded_ants], 2147483647)
-
-        # Calculating possible exits for each ant in the maze:
-        old_pos_ants = self.historic_path[range(0, self.seeds.shape[0]), self.age[:], :]
-        has_north_exit = np.bitwise_and(the_maze.maze[old_pos_ants[:, 0], old_pos_ants[:, 1]], maze.NORTH) > 0
-        has_east_exit = np.bitwise_and(the_maze.maze[old_pos_ants[:, 0], old_pos_ants[:, 1]], maze.EAST) > 0
-        has_south_exit = np.bitwise_and(the_maze.maze[old_pos_ants[:, 0], old_pos_ants[:, 1]], maze.SOUTH) > 0
-        has_west_exit = np.bitwise_and(the_maze.maze[old_pos_ants[:, 0], old_pos_ants[:, 1]], maze.WEST) > 0
-
-        # Reading neighboring pheromones:
-        north_pos = np.copy(old_pos_ants)
-        north_pos[:, 1] += 1
-        north_pheromone = pheromones.pheromon[north_pos[:, 0], north_pos[:, 1]]*has_north_exit
-
-        east_pos = np.copy(old_pos_ants)
-        east_pos[:, 0] += 1
-        east_pos[:, 1] += 2
-        east_pheromone = pheromones.pheromon[east_pos[:, 0], east_pos[:, 1]]*has_east_exit
-
-        south_pos = np.copy(old_pos_ants)
-        south_pos[:, 0] += 2
-        south_pos[:, 1] += 1
-        south_pheromone = pheromones.pheromon[south_pos[:, 0], south_pos[:, 1]]*has_south_exit
-
-        west_pos = np.copy(old_pos_ants)
-        west_pos[:, 0] += 1
-        west_pheromone = pheromones.pheromon[west_pos[:, 0], west_pos[:, 1]]*has_west_exit
-
-        max_pheromones = np.maximum(north_pheromone, east_pheromone)
-        max_pheromones = np.maximum(max_pheromones, south_pheromone)
-        max_pheromones = np.maximum(max_pheromones, west_pheromone)
-
-        # Calculating choices for all ants not carrying food (for others, we calculate but it doesn't matter)
-        choices = self.seeds[:] / 2147483647.
-
-        # Ants explore the maze by choice or if no pheromone can guide them:
-        ind_exploring_ants = np.nonzero(
-            np.logical_or(choices[unloaded_ants] <= exploration_coefs, max_pheromones[unloaded_ants] == 0.))[0]
-        if ind_exploring_ants.shape[0] > 0:
-            ind_exploring_ants = unloaded_ants[ind_exploring_ants]
-            valid_moves = np.zeros(choices.shape[0], np.int8)
-            nb_exits = has_north_exit * np.ones(has_north_exit.shape) + has_east_exit * np.ones(has_east_exit.shape) + \
-                has_south_exit * np.ones(has_south_exit.shape) + has_west_exit * np.ones(has_west_exit.shape)
-            while np.any(valid_moves[ind_exploring_ants] == 0):
-                # Calculating indices of ants whose last move was not valid:
-                ind_ants_to_move = ind_exploring_ants[valid_moves[ind_exploring_ants] == 0]
-                self.seeds[:] = np.mod(16807*self.seeds[:], 2147483647)
-                # Choosing a random direction:
-                dir = np.mod(self.seeds[ind_ants_to_move], 4)
-                old_pos = self.historic_path[ind_ants_to_move, self.age[ind_ants_to_move], :]
-                new_pos = np.copy(old_pos)
-                new_pos[:, 1] -= np.logical_and(dir == d.DIR_WEST,
-                                                has_west_exit[ind_ants_to_move]) * np.ones(new_pos.shape[0], dtype=np.int16)
-                new_pos[:, 1] += np.logical_and(dir == d.DIR_EAST,
-                                                has_east_exit[ind_ants_to_move]) * np.ones(new_pos.shape[0], dtype=np.int16)
-                new_pos[:, 0] -= np.logical_and(dir == d.DIR_NORTH,
-                                                has_north_exit[ind_ants_to_move]) * np.ones(new_pos.shape[0], dtype=np.int16)
-                new_pos[:, 0] += np.logical_and(dir == d.DIR_SOUTH,
-                                                has_south_exit[ind_ants_to_move]) * np.ones(new_pos.shape[0], dtype=np.int16)
-                # Valid move if we didn't stay in place due to a wall
-                valid_moves[ind_ants_to_move] = np.logical_or(new_pos[:, 0] != old_pos[:, 0], new_pos[:, 1] != old_pos[:, 1])
-                # and if we're not in the opposite direction of the previous move (and if there are other exits)
-                valid_moves[ind_ants_to_move] = np.logical_and(
-                    valid_moves[ind_ants_to_move],
-                    np.logical_or(dir != 3-self.directions[ind_ants_to_move], nb_exits[ind_ants_to_move] == 1))
-                # Calculating indices of ants whose move we just validated:
-                ind_valid_moves = ind_ants_to_move[np.nonzero(valid_moves[ind_ants_to_move])[0]]
-                # For these ants, we update their positions and directions
-                self.historic_path[ind_valid_moves, self.age[ind_valid_moves] + 1, :] = new_pos[valid_moves[ind_ants_to_move] == 1, :]
-                self.directions[ind_valid_moves] = dir[valid_moves[ind_ants_to_move] == 1]
-
-        ind_following_ants = np.nonzero(np.logical_and(choices[unloaded_ants] > exploration_coefs,
-                                                       max_pheromones[unloaded_ants] > 0.))[0]
-        if ind_following_ants.shape[0] > 0:
-            ind_following_ants = unloaded_ants[ind_following_ants]
-            self.historic_path[ind_following_ants, self.age[ind_following_ants] + 1, :] = \
-                self.historic_path[ind_following_ants, self.age[ind_following_ants], :]
-            max_east = (east_pheromone[ind_following_ants] == max_pheromones[ind_following_ants])
-            self.historic_path[ind_following_ants, self.age[ind_following_ants]+1, 1] += \
-                max_east * np.ones(ind_following_ants.shape[0], dtype=np.int16)
-            max_west = (west_pheromone[ind_following_ants] == max_pheromones[ind_following_ants])
-            self.historic_path[ind_following_ants, self.age[ind_following_ants]+1, 1] -= \
-                max_west * np.ones(ind_following_ants.shape[0], dtype=np.int16)
-            max_north = (north_pheromone[ind_following_ants] == max_pheromones[ind_following_ants])
-            self.historic_path[ind_following_ants, self.age[ind_following_ants]+1, 0] -= max_north * np.ones(ind_following_ants.shape[0], dtype=np.int16)
-            max_south = (south_pheromone[ind_following_ants] == max_pheromones[ind_following_ants])
-            self.historic_path[ind_following_ants, self.age[ind_following_ants]+1, 0] += max_south * np.ones(ind_following_ants.shape[0], dtype=np.int16)
-
-        # Aging one unit for the age of ants not carrying food
-        if unloaded_ants.shape[0] > 0:
-            self.age[unloaded_ants] += 1
-
-        # Killing ants at the end of their life:
-        ind_dying_ants = np.nonzero(self.age == self.max_life)[0]
-        if ind_dying_ants.shape[0] > 0:
-            self.age[ind_dying_ants] = 0
-            self.historic_path[ind_dying_ants, 0, 0] = pos_nest[0]
-            self.historic_path[ind_dying_ants, 0, 1] = pos_nest[1]
-            self.directions[ind_dying_ants] = d.DIR_NONE
-
-        # For ants reaching food, we update their states:
-        ants_at_food_loc = np.nonzero(np.logical_and(self.historic_path[unloaded_ants, self.age[unloaded_ants], 0] == pos_food[0],
-                                                     self.historic_path[unloaded_ants, self.age[unloaded_ants], 1] == pos_food[1]))[0]
-        if ants_at_food_loc.shape[0] > 0:
-            ants_at_food = unloaded_ants[ants_at_food_loc]
-            self.is_loaded[ants_at_food] = True
-
-    def advance(self, the_maze, pos_food, pos_nest, pheromones, food_counter=0):
-        loaded_ants = np.nonzero(self.is_loaded == True)[0]
-        unloaded_ants = np.nonzero(self.is_loaded == False)[0]
-        new_food = 0
-        if loaded_ants.shape[0] > 0:
-            new_food = self.return_to_nest(loaded_ants, pos_nest, 0)
-
-        if unloaded_ants.shape[0] > 0:
-            self.explore(unloaded_ants, the_maze, pos_food, pos_nest, pheromones)
-
-        old_pos_ants = self.historic_path[range(0, self.seeds.shape[0]), self.age[:], :]
-        has_north_exit = np.bitwise_and(the_maze.maze[old_pos_ants[:, 0], old_pos_ants[:, 1]], maze.NORTH) > 0
-        has_east_exit = np.bitwise_and(the_maze.maze[old_pos_ants[:, 0], old_pos_ants[:, 1]], maze.EAST) > 0
-        has_south_exit = np.bitwise_and(the_maze.maze[old_pos_ants[:, 0], old_pos_ants[:, 1]], maze.SOUTH) > 0
-        has_west_exit = np.bitwise_and(the_maze.maze[old_pos_ants[:, 0], old_pos_ants[:, 1]], maze.WEST) > 0
-        # Marking pheromones:
-        old_pheromone = pheromones.pheromon.copy()
-        [pheromones.mark(self.historic_path[i, self.age[i], :],
-                         [has_north_exit[i], has_east_exit[i], has_west_exit[i], has_south_exit[i]], old_pheromone) for i in range(self.directions.shape[0])]
-        
-
-        #réunion des phéromones entre les processus
-        
-        pheromones.pheromon = old_pheromone.copy()
-        synchronisation_and_send_fonction(new_food,pheromones,ants)
-        return food_counter
-    
-    def display(self, screen):
-        [screen.blit(self.sprites[self.directions[i]], (8*self.historic_path[i, self.age[i], 1], 8*self.historic_path[i, self.age[i], 0])) for i in range(self.directions.shape[0])]
-
-def synchronisation_and_send_fonction(new_food,pheromones,ants):
-    #envoie des phéromones
-    comm.Send(pheromones.pheromon, dest=0)
-    food = comm.reduce(new_food, op=MPI.SUM, root=0)
-    comm.Send(ants.directions, dest=0)
-    comm.Send(ants.age, dest=0)
-    comm.Send(ants.historic_path, dest=0)
-
-    
-
-if __name__ == "__main__":
-    import sys
-    import time
-    deb_main = time.time()
-
-    #initialisation des processus
-    comm = MPI.COMM_WORLD.Dup()
-    nbp = comm.size
-    rank = comm.rank
-
-
-    print(f"Hello from {rank} of {nbp}")
-
-    pg.init()
-    size_laby = 25, 25
-    if len(sys.argv) > 2:
-        size_laby = int(sys.argv[1]),int(sys.argv[2])
-
-    resolution = size_laby[1]*8, size_laby[0]*8
-
-    if rank == 0:
-        screen = pg.display.set_mode(resolution)
-    
-    nb_ants = size_laby[0]*size_laby[1]//4
-    max_life = 500
-    if len(sys.argv) > 3:
-        max_life = int(sys.argv[3])
-    pos_food = size_laby[0]-1, size_laby[1]-1
-    pos_nest = 0, 0
-    a_maze = maze.Maze(size_laby, 12345, rank)
-
-    ants = Colony(nb_ants, pos_nest, max_life)
-    unloaded_ants = np.array(range(nb_ants))
-    alpha = 0.9
-    beta  = 0.99
-    if len(sys.argv) > 4:
-        alpha = float(sys.argv[4])
-    if len(sys.argv) > 5:
-        beta = float(sys.argv[5])
-    pherom = pheromone.Pheromon(size_laby, pos_food, alpha, beta)
-    
-    if rank == 0:
-        mazeImg = a_maze.display()
-    food_counter = 0
-    
-
-    snapshop_taken = False
-    first_check = True
-    second_check = True
-    while True:
-        for event in pg.event.get():
-            if event.type == pg.QUIT:
-                pg.quit()
-                exit(0)
-
-        if rank == 0:
-            new_food = 0
-            food = 0
-            actualise_pheromone = np.zeros(pherom.pheromon.shape).flatten()
-            comm.Recv(actualise_pheromone, source=1)
-
-            pherom.pheromon = actualise_pheromone.reshape(pherom.pheromon.shape)
-
-            food = comm.reduce(new_food, op=MPI.SUM, root=0)
-
-            food_counter += food
-
-            direction_ants = np.empty_like(ants.directions)
-            age_ants = np.empty_like(ants.age)
-            historic_path_ants = np.empty_like(ants.historic_path)
-
-            # Recevez les données du processus 0
-            comm.Recv(direction_ants, source=1)
-            comm.Recv(age_ants, source=1)
-            comm.Recv(historic_path_ants, source=1)
-
-            # Utilisez les données reçues
-            ants.directions = direction_ants
-            ants.age = age_ants
-            ants.historic_path = historic_path_ants
-
-            deb = time.time()
-            
-            pherom.display(screen)
-            screen.blit(mazeImg, (0, 0))
-            ants.display(screen)
-            pg.display.update()
-            end = time.time()
-
-            if food_counter == 1 and not snapshop_taken:
-                pg.image.save(screen, "MyFirstFood.png")
-                snapshop_taken = True
-            
-            #mesure des durées d'atteint d'objectif
-            if food_counter >= 1 and food_counter < 999:
-                if first_check==True:
-                    fin_first_food = time.time()
-                    first_check = False
-                print(f"FPS : {1./(end-deb):6.2f}, nourriture : {food_counter:7d}, temps pour première nouriture : {fin_first_food - deb_main}", end='\r')
-            elif food_counter >= 1000:
-                if second_check==True:
-                    fin_second_food = time.time()
-                    second_check = False
-                print(f"FPS : {1./(end-deb):6.2f}, nourriture : {food_counter:7d}, temps pour première nouriture : {fin_first_food - deb_main}, temps pour 1000 nouriture : {fin_second_food - deb_main}\n")
-                exit(0)
-            else:
-                print(f"FPS : {1./(end-deb):6.2f}, nourriture : {food_counter:7d}", end='\r')
-        
-        else :
-            
-            food_counter = ants.advance(a_maze, pos_food, pos_nest, pherom, food_counter)
+"""
+Module managing an ant colony in a labyrinth.
+"""
+import numpy as np
+import maze
+import pheromone
+import direction as d
+import pygame as pg
+import mpi4py as mpi
+from mpi4py import MPI
+
+try:
+    from ants_kernel import step_explore
+except ImportError:  # numba is optional : fall back to the pure NumPy version
+    step_explore = None
+
+UNLOADED, LOADED = False, True
+
+exploration_coefs = 0.
+
+# Row/column move of each direction, indexed by the DIR_* constants
+# (NORTH, EAST, WEST, SOUTH)
+DIR_MOVE_R = np.array([-1, 0, 0, 1], dtype=np.int16)
+DIR_MOVE_C = np.array([0, 1, -1, 0], dtype=np.int16)
+
+
+class Colony:
+    """
+    Represent an ant colony. Ants are not individualized for performance reasons!
+
+    Inputs :
+        nb_ants  : Number of ants in the anthill
+        pos_init : Initial positions of ants (anthill position)
+        max_life : Maximum life that ants can reach
+    """
+    def __init__(self, nb_ants, pos_init, max_life):
+        # Vectorized random stream of the colony (PCG64), decorrelated between ranks.
+        # Much cheaper than the manual LCG : no int64 multiply + modulo per ant.
+        self.rng = np.random.default_rng(12345 + rank)
+        # Each ant keeps its own seed for the per-ant LCG of the numba kernel,
+        # offset per rank : without it, same-index ants on different compute
+        # ranks draw identical movement streams and walk in lockstep
+        self.seeds = np.arange(1, nb_ants+1, dtype=np.int64) + rank*nb_ants
+        # State of each ant : loaded or unloaded
+        self.is_loaded = np.zeros(nb_ants, dtype=np.int8)
+        # Amount of life for each ant = 75% à 100% of maximal ants life
+        self.max_life = max_life * np.ones(nb_ants, dtype=np.int32)
+        self.max_life -= np.int32(max_life*self.rng.random(nb_ants))//4
+        # Ages of ants : zero at beginning
+        self.age = np.zeros(nb_ants, dtype=np.int64)
+        # History of the path taken by each ant, stored as one array per
+        # coordinate (SoA) so each coordinate is read with unit stride.
+        # The position at the ant's age represents its current position.
+        self.hist_r = np.zeros((nb_ants, max_life+1), dtype=np.int16)
+        self.hist_c = np.zeros((nb_ants, max_life+1), dtype=np.int16)
+        self.hist_r[:, 0] = pos_init[0]
+        self.hist_c[:, 0] = pos_init[1]
+        # Direction in which the ant is currently facing (depends on the direction it came from).
+        self.directions = d.DIR_NONE*np.ones(nb_ants, dtype=np.int8)
+        # Cheap upper bound of age.max() and first age at which an ant can
+        # die : lets explore skip the dying-ants scan entirely while no ant
+        # can have reached its max_life yet
+        self._max_age = 0
+        self._min_max_life = int(self.max_life.min())
+        # Single-element typed buffers for the food reduction
+        self.food_buf = np.zeros(1, dtype=np.int32)
+        self.food_out = np.zeros(1, dtype=np.int32)
+        # Per-tick scratch arrays of explore/advance : allocated once and
+        # refilled with out=/in-place operations, instead of hitting the
+        # allocator with ~15 fresh length-N temporaries at every tick.
+        self._ants_range = np.arange(nb_ants, dtype=np.int64)
+        self._flat_idx = np.empty(nb_ants, dtype=np.int64)
+        self._rows = np.empty(nb_ants, dtype=np.int16)
+        self._cols = np.empty(nb_ants, dtype=np.int16)
+        self._rows_1 = np.empty(nb_ants, dtype=np.int16)
+        self._cols_1 = np.empty(nb_ants, dtype=np.int16)
+        self._cell_bits = np.empty(nb_ants, dtype=np.int8)
+        self._exit_bits = np.empty(nb_ants, dtype=np.int8)
+        self._has_north = np.empty(nb_ants, dtype=bool)
+        self._has_east = np.empty(nb_ants, dtype=bool)
+        self._has_south = np.empty(nb_ants, dtype=bool)
+        self._has_west = np.empty(nb_ants, dtype=bool)
+        self._pher_n = np.empty(nb_ants, dtype=np.float32)
+        self._pher_e = np.empty(nb_ants, dtype=np.float32)
+        self._pher_s = np.empty(nb_ants, dtype=np.float32)
+        self._pher_w = np.empty(nb_ants, dtype=np.float32)
+        self._max_pher = np.empty(nb_ants, dtype=np.float32)
+        self._choices = np.empty(nb_ants, dtype=np.double)
+        self._valid_dirs = np.empty((nb_ants, 4), dtype=np.int8)
+        self._cumsum_dirs = np.empty((nb_ants, 4), dtype=np.int8)
+        self.sprites = []
+        if rank == 0 :
+            img = pg.image.load("ants.png").convert_alpha()
+            for i in range(0, 32, 8):
+                self.sprites.append(pg.Surface.subsurface(img, i, 0, 8, 8))
+
+    def return_to_nest(self, loaded_mask, pos_nest, food_counter):
+        """
+        Function that returns the ants carrying food to their nests.
+
+        Inputs :
+            loaded_mask: Boolean mask of the ants carrying food
+            pos_nest: Position of the nest where ants should go
+            food_counter: Current quantity of food in the nest
+
+        Returns the new quantity of food
+        """
+        self.age[loaded_mask] -= 1
+
+        # Single fused test, full length and gated by the mask : two
+        # unit-stride gathers, two comparisons and no nonzero pass
+        in_nest = np.logical_and(self.hist_r[self._ants_range, self.age] == pos_nest[0],
+                                 self.hist_c[self._ants_range, self.age] == pos_nest[1])
+        in_nest &= loaded_mask
+        nb_arrived = int(np.count_nonzero(in_nest))
+        if nb_arrived > 0:
+            self.is_loaded[in_nest] = UNLOADED
+            self.age[in_nest] = 0
+            food_counter += nb_arrived
+        return food_counter
+
+    def explore(self, unloaded_mask, the_maze, pos_food, pos_nest, pheromones):
+        """
+        Management of unloaded ants exploring the maze.
+
+        Inputs:
+            unloaded_mask: Boolean mask of the ants that are not loaded
+            maze        : The maze in which ants move
+            posFood     : Position of food in the maze
+            posNest     : Position of the ants' nest in the maze
+            pheromones  : The pheromone map (which also has ghost cells for
+                          easier edge management)
+
+        Outputs: None
+        """
+        if step_explore is not None:
+            # Fused Numba kernel : one parallel pass over the ants, every
+            # intermediate stays in registers instead of length-N temporaries.
+            step_explore(the_maze.maze, pheromones.pheromon, self.hist_r,
+                         self.hist_c, self.age, self.seeds, self.directions,
+                         unloaded_mask, exploration_coefs)
+        else:
+            self.explore_numpy(unloaded_mask, the_maze, pos_food, pheromones)
+
+        # Aging one unit for the age of ants not carrying food
+        self.age[unloaded_mask] += 1
+
+        # Killing ants at the end of their life. The scan is skipped while no
+        # ant can have reached its max_life yet : _max_age is an upper bound
+        # of age.max(), incremented with the aging step and recalibrated
+        # whenever the scan runs (resets only ever lower the true maximum).
+        self._max_age += 1
+        if self._max_age >= self._min_max_life:
+            dying_mask = self.age == self.max_life
+            if dying_mask.any():
+                self.age[dying_mask] = 0
+                self.hist_r[dying_mask, 0] = pos_nest[0]
+                self.hist_c[dying_mask, 0] = pos_nest[1]
+                self.directions[dying_mask] = d.DIR_NONE
+            self._max_age = int(self.age.max())
+
+        if step_explore is not None:
+            # The numba kernel does not expose the new positions, so the food
+            # test gathers the current position of each ant (the NumPy path
+            # folds this test into its final position write instead) :
+            at_food = np.logical_and(self.hist_r[self._ants_range, self.age] == pos_food[0],
+                                     self.hist_c[self._ants_range, self.age] == pos_food[1])
+            at_food &= unloaded_mask
+            self.is_loaded[at_food] = LOADED
+
+    def exit_masks(self, the_maze):
+        """
+        Position of every ant and exit information of the cell it stands on :
+        one maze gather fetches the packed exit nibble, from which the four
+        boolean masks are derived.  Positions change between explore and the
+        marking step of advance (moves, aging, deaths), so the gather runs on
+        the current positions at each call instead of being cached.  The
+        returned arrays are the scratch buffers of the colony, rewritten at
+        each call.
+        """
+        # Flat gathers through np.take so the results land in the scratch
+        # buffers (fancy indexing cannot write into a preallocated output) :
+        np.multiply(self._ants_range, self.hist_r.shape[1], out=self._flat_idx)
+        self._flat_idx += self.age
+        np.take(self.hist_r.reshape(-1), self._flat_idx, out=self._rows)
+        np.take(self.hist_c.reshape(-1), self._flat_idx, out=self._cols)
+        np.multiply(self._rows, the_maze.maze.shape[1], out=self._flat_idx)
+        self._flat_idx += self._cols
+        np.take(the_maze.maze.reshape(-1), self._flat_idx, out=self._cell_bits)
+        np.bitwise_and(self._cell_bits, maze.NORTH, out=self._exit_bits)
+        np.greater(self._exit_bits, 0, out=self._has_north)
+        np.bitwise_and(self._cell_bits, maze.EAST, out=self._exit_bits)
+        np.greater(self._exit_bits, 0, out=self._has_east)
+        np.bitwise_and(self._cell_bits, maze.SOUTH, out=self._exit_bits)
+        np.greater(self._exit_bits, 0, out=self._has_south)
+        np.bitwise_and(self._cell_bits, maze.WEST, out=self._exit_bits)
+        np.greater(self._exit_bits, 0, out=self._has_west)
+        return self._rows, self._cols, self._cell_bits, self._has_north, \
+            self._has_east, self._has_south, self._has_west
+
+    def explore_numpy(self, unloaded_mask, the_maze, pos_food, pheromones):
+        """
+        Pure NumPy version of the exploration movement, used when numba is not
+        available.  Works on full-length arrays gated by boolean masks : no
+        nonzero pass and no index-chain gathers.
+        """
+        # Calculating possible exits for each ant in the maze:
+        old_rows, old_cols, cell_bits, has_north_exit, has_east_exit, \
+            has_south_exit, has_west_exit = self.exit_masks(the_maze)
+
+        # Reading neighboring pheromones : the ghost-cell offsets are constants,
+        # so the shifted index arrays are computed once and shared between the
+        # four gathers instead of copying the position arrays per direction.
+        rows_1 = np.add(old_rows, 1, out=self._rows_1)
+        cols_1 = np.add(old_cols, 1, out=self._cols_1)
+        north_pheromone = np.multiply(pheromones.pheromon[old_rows, cols_1],
+                                      has_north_exit, out=self._pher_n)
+        east_pheromone = np.multiply(pheromones.pheromon[rows_1, old_cols+2],
+                                     has_east_exit, out=self._pher_e)
+        south_pheromone = np.multiply(pheromones.pheromon[old_rows+2, cols_1],
+                                      has_south_exit, out=self._pher_s)
+        west_pheromone = np.multiply(pheromones.pheromon[rows_1, old_cols],
+                                     has_west_exit, out=self._pher_w)
+
+        max_pheromones = np.maximum(north_pheromone, east_pheromone, out=self._max_pher)
+        np.maximum(max_pheromones, south_pheromone, out=max_pheromones)
+        np.maximum(max_pheromones, west_pheromone, out=max_pheromones)
+
+        # Calculating choices for all ants not carrying food (for others, we calculate but it doesn't matter)
+        choices = self.rng.random(out=self._choices)
+
+        # Ants explore the maze by choice or if no pheromone can guide them:
+        explore_mask = np.logical_or(choices <= exploration_coefs, max_pheromones == 0.)
+        explore_mask &= unloaded_mask
+
+        # Random direction of the exploring ants, drawn full length (the draw
+        # of the other ants is computed but discarded by the np.where below).
+        # SWAR popcount of the exit nibble (pairwise sums inside the byte)
+        exit_pairs = (cell_bits & 5) + ((cell_bits >> 1) & 5)
+        nb_exits = (exit_pairs & 3) + ((exit_pairs >> 2) & 3)
+        # A direction is valid if its exit exists and if it does not go back
+        # the way the ant came (unless that is the only exit). Every cell of
+        # the maze has at least one exit, so each ant has >= 1 valid direction
+        # and a single draw over the valid set replaces rejection sampling.
+        valid_dirs = self._valid_dirs
+        valid_dirs[:, d.DIR_NORTH] = has_north_exit
+        valid_dirs[:, d.DIR_EAST] = has_east_exit
+        valid_dirs[:, d.DIR_WEST] = has_west_exit
+        valid_dirs[:, d.DIR_SOUTH] = has_south_exit
+        back_dir = 3 - self.directions
+        can_forbid = np.logical_and(nb_exits > 1, back_dir < 4)
+        valid_dirs[self._ants_range[can_forbid], back_dir[can_forbid]] = 0
+        # Choosing the k-th valid direction with a single random draw
+        # (choices is not needed anymore, so its buffer is reused) :
+        nb_valid = valid_dirs.sum(axis=1)
+        k = (self.rng.random(out=self._choices) * nb_valid).astype(np.int8)
+        cum_dirs = np.cumsum(valid_dirs, axis=1, out=self._cumsum_dirs)
+        dir = np.argmax(cum_dirs > k[:, None], axis=1).astype(np.int8)
+
+        # Move of the following ants : one step towards the strongest
+        # neighboring pheromone (possibly diagonal when directions tie,
+        # as in the original version)
+        max_east = (east_pheromone == max_pheromones)
+        max_west = (west_pheromone == max_pheromones)
+        max_north = (north_pheromone == max_pheromones)
+        max_south = (south_pheromone == max_pheromones)
+
+        # Each ant's move is selected with np.where and the unloaded rows are
+        # scattered once into the history :
+        next_r = np.where(explore_mask, old_rows + DIR_MOVE_R[dir],
+                          old_rows - max_north + max_south)
+        next_c = np.where(explore_mask, old_cols + DIR_MOVE_C[dir],
+                          old_cols + max_east - max_west)
+        moving = self._ants_range[unloaded_mask]
+        ages_1 = self.age[unloaded_mask] + 1
+        self.hist_r[moving, ages_1] = next_r[unloaded_mask]
+        self.hist_c[moving, ages_1] = next_c[unloaded_mask]
+        self.directions[explore_mask] = dir[explore_mask]
+
+        # Ants reaching food are detected on the just-computed position, with
+        # no second gather of the history. An ant dying on the food cell this
+        # very tick is not loaded : it is reset to the nest right afterwards,
+        # as in the original ordering of the tests.
+        at_food = np.logical_and(next_r == pos_food[0], next_c == pos_food[1])
+        at_food &= unloaded_mask
+        at_food &= self.age + 1 != self.max_life
+        self.is_loaded[at_food] = LOADED
+
+    def advance(self, the_maze, pos_food, pos_nest, pheromones, food_counter=0):
+        loaded_mask = self.is_loaded == LOADED
+        unloaded_mask = ~loaded_mask
+        new_food = 0
+        if loaded_mask.any():
+            new_food = self.return_to_nest(loaded_mask, pos_nest, 0)
+
+        if unloaded_mask.any():
+            self.explore(unloaded_mask, the_maze, pos_food, pos_nest, pheromones)
+
+        old_rows, old_cols, cell_bits, has_north_exit, has_east_exit, \
+            has_south_exit, has_west_exit = self.exit_masks(the_maze)
+        # Marking pheromones (vectorized over the whole colony). The second
+        # buffer is reused every tick : a memcpy into it replaces the fresh
+        # grid allocation of .copy().
+        old_pheromone = pheromones.pheromon_buffer
+        np.copyto(old_pheromone, pheromones.pheromon)
+        pheromones.mark(old_rows, old_cols,
+                        [has_north_exit, has_east_exit, has_west_exit, has_south_exit], old_pheromone)
+
+        # Swap the double buffer : the marked grid becomes the current one
+        pheromones.pheromon, pheromones.pheromon_buffer = old_pheromone, pheromones.pheromon
+        synchronisation_and_send_fonction(new_food,pheromones,ants)
+        return food_counter
+    
+    def display(self, screen):
+        # Screen coordinates are computed vectorized, then a single blits call
+        # draws every sprite instead of one Python-level blit per ant.
+        ants_range = self._ants_range
+        xs = 8*self.hist_c[ants_range, self.age]
+        ys = 8*self.hist_r[ants_range, self.age]
+        screen.blits([(self.sprites[self.directions[i]], (xs[i], ys[i])) for i in ants_range])
+
+def synchronisation_and_send_fonction(new_food,pheromones,ants):
+    #envoie des phéromones
+    comm.Send(pheromones.pheromon, dest=0)
+    # Typed reduction of the food (no pickle round-trip like comm.reduce)
+    ants.food_buf[0] = new_food
+    comm.Reduce([ants.food_buf, MPI.INT], None, op=MPI.SUM, root=0)
+    comm.Send(ants.directions, dest=0)
+    comm.Send(ants.age, dest=0)
+    comm.Send(ants.hist_r, dest=0)
+    comm.Send(ants.hist_c, dest=0)
+
+    
+
+if __name__ == "__main__":
+    import sys
+    import time
+    import queue
+    import threading
+    deb_main = time.time()
+
+    #initialisation des processus
+    comm = MPI.COMM_WORLD.Dup()
+    nbp = comm.size
+    rank = comm.rank
+
+
+    print(f"Hello from {rank} of {nbp}")
+
+    pg.init()
+    size_laby = 25, 25
+    if len(sys.argv) > 2:
+        size_laby = int(sys.argv[1]),int(sys.argv[2])
+
+    resolution = size_laby[1]*8, size_laby[0]*8
+
+    if rank == 0:
+        screen = pg.display.set_mode(resolution)
+    
+    nb_ants = size_laby[0]*size_laby[1]//4
+    max_life = 500
+    if len(sys.argv) > 3:
+        max_life = int(sys.argv[3])
+    pos_food = size_laby[0]-1, size_laby[1]-1
+    pos_nest = 0, 0
+    a_maze = maze.Maze(size_laby, 12345, rank)
+
+    ants = Colony(nb_ants, pos_nest, max_life)
+    unloaded_ants = np.array(range(nb_ants))
+    alpha = 0.9
+    beta  = 0.99
+    if len(sys.argv) > 4:
+        alpha = float(sys.argv[4])
+    if len(sys.argv) > 5:
+        beta = float(sys.argv[5])
+    pherom = pheromone.Pheromon(size_laby, pos_food, alpha, beta)
+    
+    if rank == 0:
+        mazeImg = a_maze.display()
+    food_counter = 0
+    
+
+    snapshop_taken = False
+    first_check = True
+    second_check = True
+
+    #buffers de réception alloués une fois pour toutes, avec les bons dtypes
+    if rank == 0:
+        pheromone_recv = np.zeros(pherom.pheromon.shape, dtype=pherom.pheromon.dtype)
+        direction_ants = np.empty_like(ants.directions)
+        age_ants = np.empty_like(ants.age)
+        hist_r_ants = np.empty_like(ants.hist_r)
+        hist_c_ants = np.empty_like(ants.hist_c)
+
+        #  Off-screen rendering in a worker thread : the frame is drawn from a
+        #  snapshot of the state while the main thread receives the next tick
+        #  (pygame's C blits release the GIL). Only pg.display.update() stays
+        #  on the main thread.
+        pherom_render = pheromone.Pheromon(size_laby, pos_food, alpha, beta)
+        ants_render = Colony(nb_ants, pos_nest, max_life)
+        render_in = queue.Queue(maxsize=1)
+        render_out = queue.Queue(maxsize=1)
+        render_busy = False
+
+        def render_frames():
+            while True:
+                render_in.get()
+                frame = pg.Surface(resolution)
+                pherom_render.display(frame)
+                frame.blit(mazeImg, (0, 0))
+                ants_render.display(frame)
+                render_out.put(frame)
+
+        threading.Thread(target=render_frames, daemon=True).start()
+
+    while True:
+        for event in pg.event.get():
+            if event.type == pg.QUIT:
+                pg.quit()
+                exit(0)
+
+        if rank == 0:
+            comm.Recv(pheromone_recv, source=1)
+            pherom.pheromon = pheromone_recv
+
+            # Typed reduction of the food (no pickle round-trip like comm.reduce)
+            ants.food_buf[0] = 0
+            comm.Reduce([ants.food_buf, MPI.INT], [ants.food_out, MPI.INT], op=MPI.SUM, root=0)
+            food_counter += int(ants.food_out[0])
+
+            # Recevez les données du processus 1
+            comm.Recv(direction_ants, source=1)
+            comm.Recv(age_ants, source=1)
+            comm.Recv(hist_r_ants, source=1)
+            comm.Recv(hist_c_ants, source=1)
+
+            # Utilisez les données reçues
+            ants.directions = direction_ants
+            ants.age = age_ants
+            ants.hist_r = hist_r_ants
+            ants.hist_c = hist_c_ants
+
+            deb = time.time()
+
+            # Flip the frame finished by the renderer, if any
+            try:
+                frame = render_out.get_nowait()
+                render_busy = False
+                screen.blit(frame, (0, 0))
+                pg.display.update()
+            except queue.Empty:
+                pass
+            # Hand the fresh tick to the renderer when it is idle ; otherwise
+            # the frame is skipped and the simulation goes on
+            if not render_busy:
+                np.copyto(pherom_render.pheromon, pherom.pheromon)
+                np.copyto(ants_render.directions, ants.directions)
+                np.copyto(ants_render.age, ants.age)
+                np.copyto(ants_render.hist_r, ants.hist_r)
+                np.copyto(ants_render.hist_c, ants.hist_c)
+                render_in.put(True)
+                render_busy = True
+            end = time.time()
+
+            if food_counter == 1 and not snapshop_taken:
+                pg.image.save(screen, "MyFirstFood.png")
+                snapshop_taken = True
+            
+            #mesure des durées d'atteint d'objectif
+            if food_counter >= 1 and food_counter < 999:
+                if first_check==True:
+                    fin_first_food = time.time()
+                    first_check = False
+                print(f"FPS : {1./(end-deb):6.2f}, nourriture : {food_counter:7d}, temps pour première nouriture : {fin_first_food - deb_main}", end='\r')
+            elif food_counter >= 1000:
+                if second_check==True:
+                    fin_second_food = time.time()
+                    second_check = False
+                print(f"FPS : {1./(end-deb):6.2f}, nourriture : {food_counter:7d}, temps pour première nouriture : {fin_first_food - deb_main}, temps pour 1000 nouriture : {fin_second_food - deb_main}\n")
+                exit(0)
+            else:
+                print(f"FPS : {1./(end-deb):6.2f}, nourriture : {food_counter:7d}", end='\r')
+        
+        else :
+            
+            food_counter = ants.advance(a_maze, pos_food, pos_nest, pherom, food_counter)
             pherom.do_evaporation(pos_food)
\ No newline at end of file
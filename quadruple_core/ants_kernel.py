@@ -0,0 +1,102 @@
+"""
+Numba kernel fusing the hot loop of Colony.explore.
+
+The NumPy version of explore materializes around fifteen temporary arrays of
+length nb_ants per tick (neighbor positions, per-direction pheromones, maxima,
+masks), each one streaming the whole colony through memory.  This kernel walks
+the ants once in parallel : every intermediate stays in registers and the new
+positions are written in place.  The per-ant body is straight-line code (no
+data-dependent loop) : the compiler parallelizes the ant loop over the cores
+and can vectorize the per-ant arithmetic.
+"""
+import numpy as np
+from numba import njit, prange
+
+import direction as d
+import maze
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def step_explore(the_maze, pheromon, hist_r, hist_c, age, seeds, directions,
+                 unloaded_mask, exploration_coef):
+    for i in prange(seeds.shape[0]):
+        # The mask is the snapshot taken by advance before return_to_nest :
+        # ants that dropped their food this very tick only move next tick,
+        # exactly like in the NumPy path.
+        if not unloaded_mask[i]:
+            continue
+        # Update of the random seed (manual pseudo-random, one stream per ant)
+        seeds[i] = (16807 * seeds[i]) % 2147483647
+        row = hist_r[i, age[i]]
+        col = hist_c[i, age[i]]
+        cell = the_maze[row, col]
+        has_north = (cell & maze.NORTH) > 0
+        has_east = (cell & maze.EAST) > 0
+        has_south = (cell & maze.SOUTH) > 0
+        has_west = (cell & maze.WEST) > 0
+
+        # Neighboring pheromones (the pheromone map has ghost cells) :
+        north_pheromone = pheromon[row, col+1] if has_north else 0.
+        east_pheromone = pheromon[row+1, col+2] if has_east else 0.
+        south_pheromone = pheromon[row+2, col+1] if has_south else 0.
+        west_pheromone = pheromon[row+1, col] if has_west else 0.
+        max_pheromone = max(max(north_pheromone, east_pheromone),
+                            max(south_pheromone, west_pheromone))
+
+        choice = seeds[i] / 2147483647.
+        if choice <= exploration_coef or max_pheromone == 0.:
+            # The ant explores.  A direction is valid if its exit exists and
+            # if it does not go back the way the ant came (unless that is the
+            # only exit).  Every cell has at least one exit, so at least one
+            # direction is valid and a single draw over the valid set picks
+            # the move : no rejection-sampling loop, the body stays
+            # straight-line and branch-predictable.
+            nb_exits = int(has_north) + int(has_east) + int(has_south) + int(has_west)
+            back = 3 - directions[i]
+            valid_north = 1 if has_north and (back != d.DIR_NORTH or nb_exits == 1) else 0
+            valid_east = 1 if has_east and (back != d.DIR_EAST or nb_exits == 1) else 0
+            valid_west = 1 if has_west and (back != d.DIR_WEST or nb_exits == 1) else 0
+            valid_south = 1 if has_south and (back != d.DIR_SOUTH or nb_exits == 1) else 0
+            nb_valid = valid_north + valid_east + valid_west + valid_south
+
+            seeds[i] = (16807 * seeds[i]) % 2147483647
+            k = (seeds[i] * nb_valid) // 2147483647
+            # The k-th valid direction, walked in the DIR_* order :
+            dir = d.DIR_NORTH
+            count = valid_north
+            if count <= k:
+                dir = d.DIR_EAST
+                count += valid_east
+            if count <= k:
+                dir = d.DIR_WEST
+                count += valid_west
+            if count <= k:
+                dir = d.DIR_SOUTH
+
+            new_row = row
+            new_col = col
+            if dir == d.DIR_NORTH:
+                new_row = row - 1
+            elif dir == d.DIR_EAST:
+                new_col = col + 1
+            elif dir == d.DIR_WEST:
+                new_col = col - 1
+            else:
+                new_row = row + 1
+            hist_r[i, age[i]+1] = new_row
+            hist_c[i, age[i]+1] = new_col
+            directions[i] = dir
+        else:
+            # The ant follows the strongest neighboring pheromone
+            new_row = row
+            new_col = col
+            if east_pheromone == max_pheromone:
+                new_col += 1
+            if west_pheromone == max_pheromone:
+                new_col -= 1
+            if north_pheromone == max_pheromone:
+                new_row -= 1
+            if south_pheromone == max_pheromone:
+                new_row += 1
+            hist_r[i, age[i]+1] = new_row
+            hist_c[i, age[i]+1] = new_col